@@ -4,35 +4,41 @@ from typing_extensions import Annotated
 from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Request
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.responses import FileResponse, Response
-from ultralytics import YOLO
 from PIL import Image
 import sqlite3
 import os
 import uuid
 import shutil
 from datetime import datetime, timedelta
-
-# Disable GPU usage
-import torch
-torch.cuda.is_available = lambda: False
+from inference import load_model, get_imgsz
+import profiling
 
 app = FastAPI()
 
+# Opt-in slow request profiling, see profiling.py
+if profiling.ENABLED:
+    app.router.route_class = profiling.ProfiledRoute
+    app.middleware("http")(profiling.profile_middleware)
+
 UPLOAD_DIR = "uploads/original"
 PREDICTED_DIR = "uploads/predicted"
-DB_PATH = "predictions.db"
+DB_PATH = os.getenv("DB_PATH", "predictions.db")
+ADMIN_USERS = [name for name in os.getenv("ADMIN_USERS", "").split(",") if name]
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(PREDICTED_DIR, exist_ok=True)
 
 # Download the AI model (tiny model ~6MB)
-model = YOLO("yolov8n.pt")  
+# MODEL_IMGSZ trades accuracy for CPU throughput
+MODEL_IMGSZ = get_imgsz()
+# SKIP_MODEL_LOAD=1 starts without the weights, e.g. when a stub model is swapped in
+model = None if os.getenv("SKIP_MODEL_LOAD") == "1" else load_model()
 security = HTTPBasic()
 
 
 # Initialize SQLite
 def init_db():
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         conn.execute("""
             CREATE TABLE IF NOT EXISTS users (
@@ -83,17 +89,23 @@ def init_db():
 init_db()
 
 def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         row = conn.execute("""
             SELECT user_id FROM users WHERE username = ? AND password = ?
         """, (credentials.username, credentials.password)).fetchone()
         if not row:
             raise HTTPException(status_code=401, detail="Invalid credentials")
         return row[0]  # return user_id
+
+def get_admin_user(credentials: HTTPBasicCredentials = Depends(security)):
+    user_id = get_current_user(credentials)
+    if credentials.username not in ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return user_id
     
 
 def save_prediction_session(uid, original_image, predicted_image, user_id):
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.execute("""
             INSERT INTO prediction_sessions (uid, original_image, predicted_image, user_id)
             VALUES (?, ?, ?, ?)
@@ -103,7 +115,7 @@ def save_detection_object(prediction_uid, label, score, box):
     """
     Save detection object to database
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.execute("""
             INSERT INTO detection_objects (prediction_uid, label, score, box)
             VALUES (?, ?, ?, ?)
@@ -123,7 +135,7 @@ def predict(
     with open(original_path, "wb") as f:
         shutil.copyfileobj(file.file, f)
 
-    results = model(original_path, device="cpu")
+    results = model(original_path, device="cpu", imgsz=MODEL_IMGSZ)
 
     annotated_frame = results[0].plot()  # NumPy image with boxes
     annotated_image = Image.fromarray(annotated_frame)
@@ -154,7 +166,7 @@ def get_prediction_by_uid(uid: str, user_id: str = Depends(get_current_user)):
     """
     Get prediction session by uid with all detected objects
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         # Get prediction session
         session = conn.execute("SELECT * FROM prediction_sessions WHERE uid = ?", (uid,)).fetchone()
@@ -192,7 +204,7 @@ def get_prediction_count_last_week(user_id: str = Depends(get_current_user)):
     """
     
     one_week_ago = datetime.now() - timedelta(days=7)
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         row = conn.execute(
         "SELECT COUNT(*) as count FROM prediction_sessions WHERE timestamp >= ? AND user_id = ?", 
@@ -205,7 +217,7 @@ def get_predictions_by_label(label: str, user_id: str = Depends(get_current_user
     """
     Get prediction sessions containing objects with specified label
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute("""
             SELECT DISTINCT ps.uid, ps.timestamp
@@ -221,7 +233,7 @@ def get_predictions_by_score(min_score: float, user_id: str = Depends(get_curren
     """
     Get prediction sessions containing objects with score >= min_score
     """
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute("""
             SELECT DISTINCT ps.uid, ps.timestamp
@@ -239,7 +251,7 @@ def get_image(type: str, filename: str, user_id: str = Depends(get_current_user)
     """
     path = os.path.join("uploads", type, filename)
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         session = conn.execute(f"""
             SELECT * FROM prediction_sessions 
@@ -257,7 +269,7 @@ def get_prediction_image(uid: str, request: Request, user_id: str = Depends(get_
     Get prediction image by uid
     """
     accept = request.headers.get("accept", "")
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         session = conn.execute("SELECT predicted_image, user_id  FROM prediction_sessions WHERE uid = ?", (uid,)).fetchone()
 
@@ -281,7 +293,7 @@ def get_prediction_image(uid: str, request: Request, user_id: str = Depends(get_
 @app.get("/labels")
 def get_labels_last_week(user_id: str = Depends(get_current_user)):
     one_week_ago = datetime.now() - timedelta(days=7)
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         rows = conn.execute("""
             SELECT DISTINCT do.label
@@ -293,7 +305,7 @@ def get_labels_last_week(user_id: str = Depends(get_current_user)):
 
 @app.delete("/prediction/{uid}")
 def delete_prediction(uid: str, user_id: str = Depends(get_current_user)):
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
         session = conn.execute("SELECT * FROM prediction_sessions WHERE uid = ?", (uid,)).fetchone()
 
@@ -317,7 +329,7 @@ def delete_prediction(uid: str, user_id: str = Depends(get_current_user)):
 @app.get("/stats")
 def get_prediction_stats():
     one_week_ago = datetime.now() - timedelta(days=7)
-    with sqlite3.connect(DB_PATH) as conn:
+    with profiling.connect_db(DB_PATH) as conn:
         conn.row_factory = sqlite3.Row
 
         # Total predictions in the last week
@@ -352,6 +364,23 @@ def get_prediction_stats():
         "most_common_labels": dict(label_counts.most_common())
     }
 
+@app.get("/admin/profiles")
+def get_profiles(user_id: str = Depends(get_admin_user)):
+    """
+    List captured request profiles, newest first
+    """
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, user_id: str = Depends(get_admin_user)):
+    """
+    Download a captured request profile
+    """
+    path = profiling.profile_path(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/json", filename=f"{profile_id}.json")
+
 @app.get("/health")
 def health():
     """
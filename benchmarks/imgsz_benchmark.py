@@ -0,0 +1,201 @@
+"""
+Accuracy-vs-speed benchmark for the CPU inference image size (MODEL_IMGSZ).
+
+Runs a fixed local image set through each imgsz and reports images/sec,
+p50/p99 latency, peak RSS and label/box recall and precision against the
+640 baseline.
+
+    python benchmarks/imgsz_benchmark.py
+    python benchmarks/imgsz_benchmark.py --modes 640,480,320 --repeat 20 tests/sample.jpg
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from queue import Empty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile  # noqa: E402
+from inference import load_model, DEFAULT_IMGSZ, MODEL_WEIGHTS  # noqa: E402
+
+DEFAULT_IMAGES = ["tests/sample.jpg"]
+DEFAULT_MODES = "640,480,320"
+BASELINE_MODE = DEFAULT_IMGSZ
+IOU_THRESHOLD = 0.5
+MODE_TIMEOUT = 600
+
+
+def parse_modes(spec):
+    modes = []
+    for item in spec.split(","):
+        imgsz = int(item)
+        if imgsz <= 0 or imgsz % 32:
+            raise ValueError(f"Invalid imgsz {imgsz}, expected a positive multiple of 32")
+        modes.append(imgsz)
+    return modes
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def agreement(baseline, candidate):
+    """
+    Compare detections of one image against the baseline.
+    Returns (matched labels, matched boxes, baseline count, candidate count);
+    matches over the baseline count is recall, over the candidate count precision.
+    """
+    remaining = [d["label"] for d in candidate]
+    label_matches = 0
+    for det in baseline:
+        if det["label"] in remaining:
+            remaining.remove(det["label"])
+            label_matches += 1
+
+    unused = list(candidate)
+    box_matches = 0
+    for det in baseline:
+        best = None
+        for other in unused:
+            if other["label"] == det["label"] and iou(det["box"], other["box"]) >= IOU_THRESHOLD:
+                if best is None or iou(det["box"], other["box"]) > iou(det["box"], best["box"]):
+                    best = other
+        if best is not None:
+            unused.remove(best)
+            box_matches += 1
+
+    return label_matches, box_matches, len(baseline), len(candidate)
+
+
+def run_mode(imgsz, images, repeat, weights, queue):
+    """
+    Run in a fresh process so peak RSS is measured per mode.
+    """
+    model = load_model(weights)
+    # Warm-up: the first call fuses layers and builds the predictor
+    model(images[0], device="cpu", imgsz=imgsz, verbose=False)
+
+    latencies = []
+    detections = {}
+    for _ in range(repeat):
+        for path in images:
+            start = time.perf_counter()
+            results = model(path, device="cpu", imgsz=imgsz, verbose=False)
+            latencies.append(time.perf_counter() - start)
+            detections[path] = [
+                {
+                    "label": model.names[int(box.cls[0].item())],
+                    "box": box.xyxy[0].tolist()
+                } for box in results[0].boxes
+            ]
+
+    queue.put({
+        "latencies": latencies,
+        "detections": detections,
+        # ru_maxrss is reported in KB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    })
+
+
+def _collect(proc, queue, mode, timeout):
+    """
+    Wait for a mode's results, failing fast if its process dies or hangs.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return queue.get(timeout=1)
+        except Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"Mode {mode} failed (exit code {proc.exitcode})")
+            if time.monotonic() > deadline:
+                proc.terminate()
+                raise RuntimeError(f"Mode {mode} timed out after {timeout}s")
+
+
+def benchmark(modes, images, repeat, weights=MODEL_WEIGHTS, timeout=MODE_TIMEOUT):
+    ctx = multiprocessing.get_context("spawn")
+    if BASELINE_MODE not in modes:
+        modes = [BASELINE_MODE] + modes
+
+    raw = {}
+    for imgsz in modes:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=run_mode, args=(imgsz, images, repeat, weights, queue))
+        proc.start()
+        try:
+            raw[imgsz] = _collect(proc, queue, imgsz, timeout)
+        finally:
+            proc.join()
+
+    baseline = raw[BASELINE_MODE]["detections"]
+    report = []
+    for imgsz, data in raw.items():
+        latencies = data["latencies"]
+        labels = boxes = expected = found = 0
+        for path in images:
+            matched_labels, matched_boxes, baseline_count, count = agreement(baseline[path], data["detections"][path])
+            labels += matched_labels
+            boxes += matched_boxes
+            expected += baseline_count
+            found += count
+
+        report.append({
+            "imgsz": imgsz,
+            "images_per_sec": round(len(latencies) / sum(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "peak_rss_mb": data["peak_rss_mb"],
+            "label_recall": _ratio(labels, expected),
+            "label_precision": _ratio(labels, found),
+            "box_recall": _ratio(boxes, expected),
+            "box_precision": _ratio(boxes, found)
+        })
+    return report
+
+
+def _ratio(matches, count):
+    return round(matches / count, 3) if count else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("images", nargs="*", default=DEFAULT_IMAGES)
+    parser.add_argument("--modes", default=DEFAULT_MODES, help="comma separated imgsz values")
+    parser.add_argument("--repeat", type=int, default=10, help="passes over the image set per mode")
+    parser.add_argument("--weights", default=MODEL_WEIGHTS)
+    parser.add_argument("--timeout", type=int, default=MODE_TIMEOUT, help="seconds allowed per mode")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        modes = parse_modes(args.modes)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = benchmark(modes, args.images, args.repeat, args.weights, args.timeout)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = (f"{'imgsz':<10}{'img/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}"
+              f"{'label R':>9}{'label P':>9}{'box R':>8}{'box P':>8}")
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        print(f"{row['imgsz']:<10}{row['images_per_sec']:>8}{row['p50_ms']:>9}{row['p99_ms']:>9}"
+              f"{row['peak_rss_mb']:>9}{row['label_recall']:>9}{row['label_precision']:>9}"
+              f"{row['box_recall']:>8}{row['box_precision']:>8}")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,395 @@
+"""
+Load-test and regression benchmark for the API endpoints.
+
+Seeds a SQLite database with synthetic predictions, swaps the YOLO model for a
+deterministic stub, drives concurrent load against the endpoints through a
+uvicorn server in its own process (benchmarks/stub_server.py) and compares the
+median throughput/latency of several repetitions with a JSON baseline.
+
+    python benchmarks/load_benchmark.py --detections 1000000 --update-baseline
+    python benchmarks/load_benchmark.py --reuse-db
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import httpx
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.common import percentile  # noqa: E402
+
+DEFAULT_DB = "bench_predictions.db"
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+SAMPLE_IMAGE = "tests/sample.jpg"
+BENCH_USER = ("user1", "pass1")
+SERVER_START_TIMEOUT = 30
+WARMUP_REQUESTS = 10
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms", "max_ms")
+LABELS = ["person", "car", "dog", "cat", "sheep", "bicycle", "bus", "truck", "bird", "horse"]
+
+
+class _Box:
+    def __init__(self, cls, conf, xyxy):
+        self.cls = np.array([cls], dtype=np.float32)
+        self.conf = np.array([conf], dtype=np.float32)
+        self.xyxy = np.array([xyxy], dtype=np.float32)
+
+
+class _Result:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    def plot(self):
+        return np.zeros((64, 64, 3), dtype=np.uint8)
+
+
+class StubModel:
+    """
+    Deterministic stand-in for the YOLO model: always returns the same
+    detections and a blank annotated frame, so /predict measures request
+    handling and DB writes rather than inference.
+    """
+    names = dict(enumerate(LABELS))
+
+    def __call__(self, source, **kwargs):
+        boxes = [
+            _Box(0, 0.91, [10.0, 20.0, 110.0, 220.0]),
+            _Box(4, 0.84, [150.0, 40.0, 300.0, 190.0]),
+            _Box(2, 0.47, [320.0, 60.0, 400.0, 140.0])
+        ]
+        return [_Result(boxes)]
+
+
+def seed_db(db_path, detections, users, per_session=5, seed=0):
+    """
+    Fill db_path with synthetic sessions/detections spread over the last two
+    weeks and round-robin across users (user1 included).
+    Returns a list of session uids owned by user1.
+    """
+    rng = random.Random(seed)
+    now = datetime.now()
+
+    with sqlite3.connect(db_path) as conn:
+        user_ids = [row[0] for row in conn.execute("SELECT user_id FROM users WHERE username = ?", (BENCH_USER[0],))]
+        for i in range(users - 1):
+            user_id = str(uuid.uuid4())
+            conn.execute("INSERT OR IGNORE INTO users (user_id, username, password) VALUES (?, ?, ?)",
+                         (user_id, f"bench_user{i}", "pass"))
+            user_ids.append(user_id)
+
+        own_uids = []
+        sessions = []
+        objects = []
+        for n in range(max(1, detections // per_session)):
+            uid = str(uuid.uuid4())
+            user_id = user_ids[n % len(user_ids)]
+            timestamp = (now - timedelta(seconds=rng.randint(0, 14 * 24 * 3600))).strftime("%Y-%m-%d %H:%M:%S")
+            sessions.append((uid, timestamp, f"uploads/original/{uid}.jpg", f"uploads/predicted/{uid}.jpg", user_id))
+            if user_id == user_ids[0]:
+                own_uids.append(uid)
+            for _ in range(per_session):
+                x, y = rng.uniform(0, 500), rng.uniform(0, 500)
+                objects.append((uid, rng.choice(LABELS), round(rng.random(), 4),
+                                str([x, y, x + rng.uniform(10, 200), y + rng.uniform(10, 200)])))
+
+            if len(objects) >= 50000:
+                _flush(conn, sessions, objects)
+        _flush(conn, sessions, objects)
+
+    return own_uids
+
+
+def _flush(conn, sessions, objects):
+    conn.executemany("""
+        INSERT INTO prediction_sessions (uid, timestamp, original_image, predicted_image, user_id)
+        VALUES (?, ?, ?, ?, ?)
+    """, sessions)
+    conn.executemany("""
+        INSERT INTO detection_objects (prediction_uid, label, score, box)
+        VALUES (?, ?, ?, ?)
+    """, objects)
+    sessions.clear()
+    objects.clear()
+
+
+def dataset_size(db_path):
+    """
+    Detections and users actually in the database, recorded in the config
+    so a reused database is labelled with what it holds.
+    """
+    with sqlite3.connect(db_path) as conn:
+        detections = conn.execute("SELECT COUNT(*) FROM detection_objects").fetchone()[0]
+        users = conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+    return detections, users
+
+
+def delete_sessions(db_path, uids):
+    """
+    Remove sessions created by the /predict scenario so a reused database
+    keeps matching the dataset the baseline was recorded against.
+    """
+    with sqlite3.connect(db_path) as conn:
+        conn.executemany("DELETE FROM detection_objects WHERE prediction_uid = ?", [(uid,) for uid in uids])
+        conn.executemany("DELETE FROM prediction_sessions WHERE uid = ?", [(uid,) for uid in uids])
+
+
+def _scenarios(own_uids, created_uids):
+    """
+    (name, request factory) pairs; each factory takes an httpx.Client and a
+    request index and returns the response. Uids created by /predict are
+    appended to created_uids.
+    """
+    def predict(client, i):
+        with open(SAMPLE_IMAGE, "rb") as img:
+            response = client.post("/predict", files={"file": ("sample.jpg", img, "image/jpeg")}, auth=BENCH_USER)
+        if response.status_code == 200:
+            created_uids.append(response.json()["prediction_uid"])
+        return response
+
+    return [
+        ("POST /predict", predict),
+        ("GET /prediction/{uid}",
+         lambda client, i: client.get(f"/prediction/{own_uids[i % len(own_uids)]}", auth=BENCH_USER)),
+        ("GET /predictions/label/{label}",
+         lambda client, i: client.get(f"/predictions/label/{LABELS[i % len(LABELS)]}", auth=BENCH_USER)),
+        ("GET /predictions/score/{min_score}",
+         lambda client, i: client.get(f"/predictions/score/{0.5 + (i % 5) / 10}", auth=BENCH_USER)),
+        ("GET /stats", lambda client, i: client.get("/stats", auth=BENCH_USER)),
+        ("GET /labels", lambda client, i: client.get("/labels", auth=BENCH_USER))
+    ]
+
+
+def run_scenario(base_url, request, total, concurrency):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        nonlocal errors
+        with httpx.Client(base_url=base_url, timeout=120) as client:
+            while True:
+                with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                start = time.perf_counter()
+                response = request(client, i)
+                elapsed = time.perf_counter() - start
+                with lock:
+                    latencies.append(elapsed)
+                    if response.status_code >= 400:
+                        errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2)
+    }
+
+
+def median_result(results):
+    """
+    Combine repetitions of one scenario: median of each metric, worst error count.
+    """
+    combined = {key: round(statistics.median(r[key] for r in results), 2) for key in METRICS}
+    combined["requests"] = results[0]["requests"]
+    combined["errors"] = max(r["errors"] for r in results)
+    return combined
+
+
+def compare(baseline, current, tolerance, tail_tolerance, min_delta_ms=0):
+    """
+    Return a list of regression messages: throughput drops or p50 increases
+    beyond tolerance, and p95/p99 increases beyond tail_tolerance (fractions,
+    e.g. 0.2 for 20%). Tail percentiles rest on few samples, hence the looser bound.
+    Latency increases smaller than min_delta_ms are ignored, so jitter on fast
+    endpoints is not reported.
+    """
+    regressions = []
+    for name, result in current["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        if result["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {result['rps']}")
+        for key, allowed in (("p50_ms", tolerance), ("p95_ms", tail_tolerance), ("p99_ms", tail_tolerance)):
+            if result[key] > base[key] * (1 + allowed) and result[key] - base[key] > min_delta_ms:
+                regressions.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def start_server(port, upload_root, db_path):
+    """
+    Start benchmarks/stub_server.py in a subprocess and wait until it answers.
+    """
+    # Fail early rather than benchmarking whatever already listens on the port
+    with socket.socket() as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+        except OSError:
+            raise RuntimeError(f"Port {port} is already in use")
+
+    # app reads DB_PATH and creates the schema at import time, the stub
+    # replaces the model so the real weights are never loaded
+    env = dict(os.environ, DB_PATH=db_path, SKIP_MODEL_LOAD="1")
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "stub_server.py")
+    proc = subprocess.Popen([sys.executable, server_script, "--port", str(port), "--upload-root", upload_root], env=env)
+
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while True:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server failed to start on port {port} (exit code {proc.returncode})")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            stop_server(proc)
+            raise RuntimeError(f"Server did not start within {SERVER_START_TIMEOUT}s")
+        time.sleep(0.1)
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file to seed and serve from")
+    parser.add_argument("--reuse-db", action="store_true", help="skip seeding if --db already exists")
+    parser.add_argument("--detections", type=int, default=100000, help="synthetic detections to seed")
+    parser.add_argument("--users", type=int, default=100, help="users the detections are spread across")
+    parser.add_argument("--requests", type=int, default=500, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions per endpoint, the median is compared")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="write results to --baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed rps/p50 regression, as a fraction")
+    parser.add_argument("--tail-tolerance", type=float, default=0.5,
+                        help="allowed p95/p99 regression, as a fraction")
+    parser.add_argument("--min-delta-ms", type=float, default=5,
+                        help="ignore latency increases smaller than this")
+    args = parser.parse_args()
+
+    reuse = args.reuse_db and os.path.exists(args.db)
+    if not reuse and os.path.exists(args.db):
+        os.remove(args.db)
+    upload_root = tempfile.mkdtemp(prefix="yolo-bench-")
+    try:
+        server = start_server(args.port, upload_root, args.db)
+    except RuntimeError:
+        shutil.rmtree(upload_root, ignore_errors=True)
+        raise
+    created_uids = []
+
+    try:
+        if reuse:
+            with sqlite3.connect(args.db) as conn:
+                own_uids = [row[0] for row in conn.execute("""
+                    SELECT ps.uid FROM prediction_sessions ps JOIN users u ON ps.user_id = u.user_id
+                    WHERE u.username = ? LIMIT 1000
+                """, (BENCH_USER[0],))]
+        else:
+            start = time.perf_counter()
+            own_uids = seed_db(args.db, args.detections, args.users)
+            print(f"Seeded {args.detections} detections in {time.perf_counter() - start:.1f}s")
+
+        base_url = f"http://127.0.0.1:{args.port}"
+        detections, users = dataset_size(args.db)
+        current = {
+            "config": {
+                "detections": detections,
+                "users": users,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "repeat": args.repeat
+            },
+            "endpoints": {}
+        }
+        scenarios = _scenarios(own_uids, created_uids)
+        for name, request in scenarios:
+            run_scenario(base_url, request, WARMUP_REQUESTS, args.concurrency)
+        delete_sessions(args.db, created_uids)
+        created_uids.clear()
+        # Repetitions are interleaved across endpoints so a transient slowdown
+        # of the host lands in one repetition of several endpoints rather than
+        # in every repetition of one
+        runs = {name: [] for name, _ in scenarios}
+        for _ in range(args.repeat):
+            for name, request in scenarios:
+                runs[name].append(run_scenario(base_url, request, args.requests, args.concurrency))
+            # Every round reads the same dataset
+            delete_sessions(args.db, created_uids)
+            created_uids.clear()
+        for name, results in runs.items():
+            result = median_result(results)
+            current["endpoints"][name] = result
+            print(f"{name:<36}{result['rps']:>9} rps  p50 {result['p50_ms']:>8} ms  "
+                  f"p99 {result['p99_ms']:>8} ms  errors {result['errors']}")
+    finally:
+        stop_server(server)
+        delete_sessions(args.db, created_uids)
+        shutil.rmtree(upload_root, ignore_errors=True)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("config") != current["config"]:
+        print("Warning: baseline was recorded with a different config")
+
+    regressions = compare(baseline, current, args.tolerance, args.tail_tolerance, args.min_delta_ms)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against baseline")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,38 @@
+"""
+Serve the app with the deterministic stub model, for load_benchmark.py.
+
+Runs in its own process so the server does not share a GIL with the load
+generator. DB_PATH and SKIP_MODEL_LOAD=1 are expected in the environment.
+
+    python benchmarks/stub_server.py --port 8099 --upload-root /tmp/uploads
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+
+import app as app_module  # noqa: E402
+from benchmarks.load_benchmark import StubModel  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--upload-root", required=True, help="directory for /predict uploads")
+    args = parser.parse_args()
+
+    app_module.model = StubModel()
+    # Keep /predict uploads out of the developer's uploads/ directory
+    app_module.UPLOAD_DIR = os.path.join(args.upload_root, "original")
+    app_module.PREDICTED_DIR = os.path.join(args.upload_root, "predicted")
+    os.makedirs(app_module.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(app_module.PREDICTED_DIR, exist_ok=True)
+
+    uvicorn.run(app_module.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,24 @@
+import os
+
+MODEL_WEIGHTS = "yolov8n.pt"
+
+# Inference image size, the accuracy-vs-speed knob for CPU inference
+DEFAULT_IMGSZ = 640
+
+
+def load_model(weights=MODEL_WEIGHTS):
+    """
+    Load the YOLO model for CPU inference.
+    torch and ultralytics are imported here so the API can start without
+    them when SKIP_MODEL_LOAD is set.
+    """
+    import torch
+    from ultralytics import YOLO
+
+    # Disable GPU usage
+    torch.cuda.is_available = lambda: False
+    return YOLO(weights)
+
+
+def get_imgsz():
+    return int(os.getenv("MODEL_IMGSZ", DEFAULT_IMGSZ))
@@ -0,0 +1,372 @@
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+# Opt-in request profiling, configured from the environment.
+# When PROFILE_ENABLED is off the middleware is never installed and
+# connect_db() costs a single context variable lookup.
+ENABLED = os.getenv("PROFILE_ENABLED", "0").lower() in ("1", "true", "yes")
+SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "500"))
+SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+MAX_PROFILES = max(1, int(os.getenv("PROFILE_MAX_FILES", "50")))
+
+MAX_STACK_DEPTH = 64
+PROFILE_ID_RE = re.compile(r"^[\w-]+$")
+
+# Frames the event loop thread sits in while waiting for I/O. The loop is
+# shared by all requests, so it is only sampled when it is doing work; the
+# request's own threads are always sampled, including time spent blocked.
+LOOP_IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("runners.py", "run"),
+    ("base_events.py", "run_until_complete"),
+}
+
+_current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Data collected for one in-flight request: folded wall-clock stacks of the
+    threads serving it and the SQL statements it ran.
+    """
+
+    def __init__(self, method, path):
+        self.id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self.timestamp = datetime.now().isoformat()
+        self.method = method
+        self.path = path
+        self.loop_thread = threading.get_ident()
+        # thread ident -> nesting depth of track_thread() blocks
+        self.threads = {}
+        self.stacks = {}
+        self.samples = 0
+        self.sql = []
+
+    def to_dict(self, status_code, duration_ms, reason):
+        return {
+            "id": self.id,
+            "timestamp": self.timestamp,
+            "method": self.method,
+            "path": self.path,
+            "status_code": status_code,
+            "duration_ms": round(duration_ms, 2),
+            "reason": reason,
+            "interval_ms": INTERVAL_MS,
+            "samples": self.samples,
+            "stacks": dict(sorted(self.stacks.items(), key=lambda item: -item[1])),
+            "sql": [{"sql": entry["sql"], "duration_ms": round(entry["duration_ms"], 3)} for entry in self.sql]
+        }
+
+
+class StackSampler:
+    """
+    One background thread that, while any profiled request is in flight,
+    samples every INTERVAL_MS the stacks of the threads each request is
+    tracked on (see track_thread) plus the event loop thread.
+    """
+
+    def __init__(self, interval_ms):
+        self.interval = interval_ms / 1000
+        self.active = set()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def add(self, profile):
+        with self.lock:
+            self.active.add(profile)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self.thread.start()
+        self.wakeup.set()
+
+    def remove(self, profile):
+        with self.lock:
+            self.active.discard(profile)
+
+    def track(self, profile, thread_id):
+        with self.lock:
+            profile.threads[thread_id] = profile.threads.get(thread_id, 0) + 1
+
+    def untrack(self, profile, thread_id):
+        with self.lock:
+            depth = profile.threads.get(thread_id, 0) - 1
+            if depth > 0:
+                profile.threads[thread_id] = depth
+            else:
+                profile.threads.pop(thread_id, None)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                targets = [(profile, list(profile.threads)) for profile in self.active]
+                if not targets:
+                    self.wakeup.clear()
+            if not targets:
+                self.wakeup.wait()
+                continue
+
+            frames = sys._current_frames()
+            folded = {}
+            samples = []
+            for profile, thread_ids in targets:
+                stacks = []
+                for thread_id in thread_ids + [profile.loop_thread]:
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    if thread_id == profile.loop_thread and thread_id not in thread_ids and _is_loop_idle(frame):
+                        continue
+                    if thread_id not in folded:
+                        folded[thread_id] = _fold(frame)
+                    stacks.append(folded[thread_id])
+                samples.append((profile, stacks))
+            del frames
+
+            with self.lock:
+                # Only touch profiles still in flight, finished ones are being saved
+                for profile, stacks in samples:
+                    if profile not in self.active:
+                        continue
+                    profile.samples += 1
+                    for stack in stacks:
+                        profile.stacks[stack] = profile.stacks.get(stack, 0) + 1
+            time.sleep(self.interval)
+
+
+def _is_loop_idle(frame):
+    return (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name) in LOOP_IDLE_FRAMES
+
+
+def _fold(frame):
+    """
+    Render a stack root-first in the folded format used by flamegraph tools.
+    """
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class TracedCursor(sqlite3.Cursor):
+    """
+    Cursor that records each statement and its execution + fetch time on the
+    current request profile. Parameters are not stored (they include passwords).
+    """
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            self._add_fetch_time(start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            self._add_fetch_time(start)
+
+    def _record(self, sql, start):
+        self._entry = {"sql": " ".join(sql.split()), "duration_ms": (time.perf_counter() - start) * 1000}
+        self._profile.sql.append(self._entry)
+
+    def _add_fetch_time(self, start):
+        entry = getattr(self, "_entry", None)
+        if entry is not None:
+            entry["duration_ms"] += (time.perf_counter() - start) * 1000
+
+
+class TracedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors are traced; its `with` block also tracks the
+    calling thread, which covers sync dependencies such as get_current_user.
+    """
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        sampler.track(self._profile, self._thread_id)
+        return super().__enter__()
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            sampler.untrack(self._profile, self._thread_id)
+
+    def cursor(self, factory=TracedCursor):
+        cursor = super().cursor(factory)
+        cursor._profile = self._profile
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def connect_db(path):
+    """
+    sqlite3.connect() that records statements when the current request is profiled.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        return sqlite3.connect(path)
+    conn = sqlite3.connect(path, factory=TracedConnection)
+    conn._profile = profile
+    return conn
+
+
+@contextmanager
+def track_thread():
+    """
+    Attribute the calling thread's stacks to the current request inside the block.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    sampler.track(profile, thread_id)
+    try:
+        yield
+    finally:
+        sampler.untrack(profile, thread_id)
+
+
+class ProfiledRoute(APIRoute):
+    """
+    Route class that runs sync endpoints inside track_thread(), so the
+    threadpool worker serving a request is sampled for that request only.
+    Async endpoints run on the event loop thread, which is always sampled.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = _tracked(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _tracked(endpoint):
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with track_thread():
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+def save_profile(data):
+    """
+    Write a profile and drop the oldest ones beyond MAX_PROFILES.
+    The file is written under a temporary name and renamed into place, so
+    readers never see a partial profile.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, data["id"] + ".json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+    # Ids start with a nanosecond timestamp, so name order is age order
+    files = sorted(name for name in os.listdir(PROFILE_DIR) if name.endswith(".json"))
+    for name in files[:-MAX_PROFILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, name))
+        except FileNotFoundError:
+            # Already rotated by a concurrent request
+            pass
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                data = json.load(f)
+            profiles.append({key: data[key] for key in
+                             ("id", "timestamp", "method", "path", "status_code", "duration_ms", "reason")})
+        except (OSError, ValueError, KeyError, TypeError):
+            # Rotated away while listing, or not a profile written by save_profile
+            continue
+    return profiles
+
+
+def profile_path(profile_id):
+    """
+    Path of a stored profile, or None if the id is invalid or unknown.
+    """
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, profile_id + ".json")
+    return path if os.path.exists(path) else None
+
+
+sampler = StackSampler(INTERVAL_MS)
+
+
+async def profile_middleware(request, call_next):
+    """
+    Profile every request, keep the ones slower than SLOW_MS plus a random
+    SAMPLE_RATE fraction of the rest.
+    """
+    profile = RequestProfile(request.method, request.url.path)
+    token = _current_profile.set(profile)
+    sampler.add(profile)
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        sampler.remove(profile)
+        _current_profile.reset(token)
+
+        reason = None
+        if duration_ms >= SLOW_MS:
+            reason = "slow"
+        elif SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+            reason = "sampled"
+        if reason:
+            # File I/O stays off the event loop
+            await run_in_threadpool(save_profile, profile.to_dict(status_code, duration_ms, reason))
@@ -0,0 +1,51 @@
+import pytest
+from fastapi.testclient import TestClient
+import app as app_module
+from benchmarks.imgsz_benchmark import agreement, parse_modes
+from benchmarks.load_benchmark import StubModel
+
+
+client = TestClient(app_module.app)
+
+
+class SpyModel(StubModel):
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, source, **kwargs):
+        self.calls.append(kwargs)
+        return super().__call__(source, **kwargs)
+
+
+def test_predict_passes_model_imgsz(monkeypatch):
+    spy = SpyModel()
+    monkeypatch.setattr(app_module, "model", spy)
+    monkeypatch.setattr(app_module, "MODEL_IMGSZ", 320)
+    with open("tests/sample.jpg", "rb") as img:
+        r = client.post("/predict", files={"file": ("sample.jpg", img, "image/jpeg")}, auth=("user1", "pass1"))
+    assert r.status_code == 200
+    assert [call["imgsz"] for call in spy.calls] == [320]
+
+
+def test_parse_modes():
+    assert parse_modes("640, 320") == [640, 320]
+
+def test_parse_modes_invalid_imgsz():
+    with pytest.raises(ValueError):
+        parse_modes("300")
+
+def test_agreement_identical():
+    dets = [{"label": "sheep", "box": [0, 0, 10, 10]}, {"label": "dog", "box": [20, 20, 30, 30]}]
+    assert agreement(dets, dets) == (2, 2, 2, 2)
+
+def test_agreement_shifted_box():
+    baseline = [{"label": "sheep", "box": [0, 0, 10, 10]}]
+    candidate = [{"label": "sheep", "box": [8, 8, 18, 18]}]
+    assert agreement(baseline, candidate) == (1, 0, 1, 1)
+
+def test_agreement_counts_spurious_detections():
+    baseline = [{"label": "sheep", "box": [0, 0, 10, 10]}]
+    candidate = baseline + [{"label": "dog", "box": [50, 50, 60, 60]}, {"label": "sheep", "box": [80, 80, 90, 90]}]
+    labels, boxes, expected, found = agreement(baseline, candidate)
+    assert (labels / expected, boxes / expected) == (1.0, 1.0)
+    assert boxes / found == pytest.approx(1 / 3)
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+import app as app_module
+from benchmarks.common import percentile
+from benchmarks.load_benchmark import StubModel, compare, median_result
+
+
+client = TestClient(app_module.app)
+
+
+def test_stub_model_predict(monkeypatch):
+    monkeypatch.setattr(app_module, "model", StubModel())
+    with open("tests/sample.jpg", "rb") as img:
+        r = client.post("/predict", files={"file": ("sample.jpg", img, "image/jpeg")}, auth=("user1", "pass1"))
+    assert r.status_code == 200
+    assert r.json()["labels"] == ["person", "sheep", "dog"]
+
+def test_compare_detects_regression():
+    baseline = {"endpoints": {"GET /stats": {"rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "errors": 0}}}
+    current = {"endpoints": {"GET /stats": {"rps": 70, "p50_ms": 10, "p95_ms": 20, "p99_ms": 45, "errors": 0}}}
+    regressions = compare(baseline, current, 0.2, 0.2)
+    assert len(regressions) == 2
+
+def test_compare_within_tolerance():
+    baseline = {"endpoints": {"GET /stats": {"rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "errors": 0}}}
+    current = {"endpoints": {"GET /stats": {"rps": 95, "p50_ms": 11, "p95_ms": 21, "p99_ms": 33, "errors": 0}}}
+    assert compare(baseline, current, 0.2, 0.2) == []
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 50) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0, 5.0], 90) == 5.0
+
+def test_compare_tail_tolerance():
+    baseline = {"endpoints": {"GET /stats": {"rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "errors": 0}}}
+    current = {"endpoints": {"GET /stats": {"rps": 100, "p50_ms": 10, "p95_ms": 26, "p99_ms": 40, "errors": 0}}}
+    assert len(compare(baseline, current, 0.2, 0.2)) == 2
+    assert compare(baseline, current, 0.2, 0.5) == []
+
+def test_median_result():
+    runs = [
+        {"requests": 10, "errors": 0, "rps": 90, "p50_ms": 12, "p95_ms": 30, "p99_ms": 50, "max_ms": 60},
+        {"requests": 10, "errors": 1, "rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 25, "max_ms": 30},
+        {"requests": 10, "errors": 0, "rps": 110, "p50_ms": 11, "p95_ms": 22, "p99_ms": 90, "max_ms": 95}
+    ]
+    result = median_result(runs)
+    assert (result["rps"], result["p50_ms"], result["p99_ms"]) == (100, 11, 50)
+    assert result["errors"] == 1
+
+def test_compare_min_delta():
+    baseline = {"endpoints": {"GET /prediction/{uid}": {"rps": 100, "p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "errors": 0}}}
+    current = {"endpoints": {"GET /prediction/{uid}": {"rps": 100, "p50_ms": 14, "p95_ms": 20, "p99_ms": 30, "errors": 0}}}
+    assert len(compare(baseline, current, 0.2, 0.5)) == 1
+    assert compare(baseline, current, 0.2, 0.5, min_delta_ms=5) == []
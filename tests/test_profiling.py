@@ -0,0 +1,166 @@
+import json
+import sqlite3
+import threading
+import time
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import app as app_module
+import profiling
+
+
+client = TestClient(app_module.app)
+
+
+@pytest.fixture
+def profiled_client(tmp_path, monkeypatch):
+    """
+    Small app with the profiling middleware installed, as app.py does when PROFILE_ENABLED is set
+    """
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "SLOW_MS", 100)
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 0)
+
+    test_app = FastAPI()
+    test_app.router.route_class = profiling.ProfiledRoute
+    test_app.middleware("http")(profiling.profile_middleware)
+
+    @test_app.get("/slow")
+    def slow_endpoint():
+        with profiling.connect_db(":memory:") as conn:
+            conn.execute("SELECT 1 AS one").fetchone()
+        time.sleep(0.2)
+        return {"ok": True}
+
+    @test_app.get("/fast")
+    def fast_endpoint():
+        return {"ok": True}
+
+    @test_app.get("/missing")
+    def missing_endpoint():
+        raise HTTPException(status_code=404, detail="Not found")
+
+    return TestClient(test_app)
+
+
+def _saved_profiles():
+    profiles = []
+    for summary in profiling.list_profiles():
+        with open(profiling.profile_path(summary["id"])) as f:
+            profiles.append(json.load(f))
+    return profiles
+
+
+def _save(profile_dir, monkeypatch, count):
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(profile_dir))
+    ids = []
+    for _ in range(count):
+        profile = profiling.RequestProfile("GET", "/stats")
+        profiling.save_profile(profile.to_dict(200, 750.0, "slow"))
+        ids.append(profile.id)
+    return ids
+
+def test_profiles_require_admin(monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_USERS", [])
+    r = client.get("/admin/profiles", auth=("user1", "pass1"))
+    assert r.status_code == 403
+
+def test_list_and_download_profiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "ADMIN_USERS", ["user1"])
+    ids = _save(tmp_path, monkeypatch, 2)
+
+    r = client.get("/admin/profiles", auth=("user1", "pass1"))
+    assert r.status_code == 200
+    assert [p["id"] for p in r.json()] == ids[::-1]
+
+    r = client.get(f"/admin/profiles/{ids[0]}", auth=("user1", "pass1"))
+    assert r.status_code == 200
+    assert r.json()["path"] == "/stats"
+
+    r = client.get("/admin/profiles/unknown", auth=("user1", "pass1"))
+    assert r.status_code == 404
+
+def test_list_profiles_skips_foreign_files(tmp_path, monkeypatch):
+    ids = _save(tmp_path, monkeypatch, 1)
+    (tmp_path / "corrupt.json").write_text("{not json")
+    (tmp_path / "foreign.json").write_text('{"hello": "world"}')
+    (tmp_path / "list.json").write_text("[1, 2]")
+    assert [p["id"] for p in profiling.list_profiles()] == ids
+
+def test_ring_buffer_drops_oldest(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "MAX_PROFILES", 2)
+    ids = _save(tmp_path, monkeypatch, 3)
+    assert [p["id"] for p in profiling.list_profiles()] == ids[:0:-1]
+
+def test_connect_db_records_sql():
+    profile = profiling.RequestProfile("GET", "/labels")
+    token = profiling._current_profile.set(profile)
+    try:
+        with profiling.connect_db(":memory:") as conn:
+            conn.row_factory = sqlite3.Row
+            conn.execute("SELECT 1 AS one").fetchone()
+    finally:
+        profiling._current_profile.reset(token)
+    assert [entry["sql"] for entry in profile.sql] == ["SELECT 1 AS one"]
+
+def test_connect_db_untraced_without_profile():
+    conn = profiling.connect_db(":memory:")
+    assert type(conn) is sqlite3.Connection
+    conn.close()
+
+def test_middleware_saves_slow_request(profiled_client):
+    r = profiled_client.get("/slow")
+    assert r.status_code == 200
+
+    [profile] = _saved_profiles()
+    assert profile["reason"] == "slow"
+    assert profile["path"] == "/slow"
+    assert profile["status_code"] == 200
+    assert profile["duration_ms"] >= 100
+    assert [entry["sql"] for entry in profile["sql"]] == ["SELECT 1 AS one"]
+    assert profile["samples"] > 0
+    assert any("slow_endpoint" in stack for stack in profile["stacks"])
+
+def test_middleware_skips_fast_request(profiled_client):
+    r = profiled_client.get("/fast")
+    assert r.status_code == 200
+    assert _saved_profiles() == []
+
+def test_middleware_sample_rate(profiled_client, monkeypatch):
+    monkeypatch.setattr(profiling, "SLOW_MS", 10000)
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 0.5)
+
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.7)
+    profiled_client.get("/fast")
+    assert _saved_profiles() == []
+
+    monkeypatch.setattr(profiling.random, "random", lambda: 0.3)
+    profiled_client.get("/fast")
+    [profile] = _saved_profiles()
+    assert profile["reason"] == "sampled"
+
+def test_middleware_records_status_code(profiled_client, monkeypatch):
+    monkeypatch.setattr(profiling, "SAMPLE_RATE", 1)
+    r = profiled_client.get("/missing")
+    assert r.status_code == 404
+    [profile] = _saved_profiles()
+    assert profile["status_code"] == 404
+
+def test_middleware_ignores_other_threads(profiled_client):
+    stop = threading.Event()
+
+    def unrelated_busy_loop():
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=unrelated_busy_loop)
+    thread.start()
+    try:
+        profiled_client.get("/slow")
+    finally:
+        stop.set()
+        thread.join()
+
+    [profile] = _saved_profiles()
+    assert any("slow_endpoint" in stack for stack in profile["stacks"])
+    assert not any("unrelated_busy_loop" in stack for stack in profile["stacks"])